@@ -2,9 +2,15 @@ from typing import Dict, List, Any, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 import json
 import os
+import re
+import uuid
 from datetime import datetime
 from utils.validators import InputValidator, DateParser, TimeParser
 from utils.document_processor import DocumentProcessor
+from utils.call_gate import GatedChatModel, api_key_id
+from utils.ingestion_queue import get_ingestion_queue
+from utils.metrics import metrics
+from utils.profiling import profiled
 
 #------- Conversational form
 class ConversationalForm:
@@ -89,57 +95,101 @@ class ConversationalForm:
 #----- Chatbot agent
 class SimpleChatbot:
     def __init__(self, google_api_key: str):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=google_api_key,
-            temperature=0.1
+        # identifies this session to the shared API rate limiter
+        self.session_id = uuid.uuid4().hex
+
+        self.llm = GatedChatModel(
+            ChatGoogleGenerativeAI(
+                model="gemini-1.5-flash",
+                google_api_key=google_api_key,
+                temperature=0.1
+            ),
+            session_id=self.session_id,
+            key_id=api_key_id(google_api_key)
         )        
        
-        self.document_processor = DocumentProcessor(google_api_key)
+        self.document_processor = DocumentProcessor(google_api_key, session_id=self.session_id)
         self.conversational_form = ConversationalForm()
 
     def setup_documents(self, uploaded_files):
         """Setup documents directly from Streamlit uploaded files"""
         return self.document_processor.setup_documents(uploaded_files)
 
+    def submit_documents(self, uploaded_files) -> str:
+        """Queue uploaded files for background ingestion and return the job id"""
+        return get_ingestion_queue().submit(self.document_processor, uploaded_files)
+
+    def get_ingestion_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get progress of a background ingestion job"""
+        return get_ingestion_queue().status(job_id)
+
+    def cancel_ingestion(self, job_id: str) -> bool:
+        """Cancel a background ingestion job"""
+        return get_ingestion_queue().cancel(job_id)
+
     def clear_documents(self):
         """Clear all documents from vector store"""
         self.document_processor.clear_vectorstore()
 
+    @profiled("chat", metadata=lambda self, user_input: {
+        "input_chars": len(user_input),
+        "form_step": self.conversational_form.current_step,
+        "has_documents": self.document_processor.vectorstore is not None,
+    })
     def chat(self, user_input: str) -> str:
         """Main chat function"""
-        user_lower = user_input.lower().strip()        
-      
-        # Handle booking flow first
+        with metrics.timer("chat"):
+            with metrics.timer("intent_routing"):
+                intent = self._route_intent(user_input)
+            metrics.increment("chat_requests", intent=intent)
+
+            # Handle booking flow first
+            if intent == "booking_flow":
+                return self._handle_booking_flow(user_input)
+
+            # Handle booking requests
+            if intent == "booking_start":
+                self.conversational_form.current_step = "collecting"
+                return "I'd be happy to help you book an appointment! 📅\n\nLet's start with your full name:"
+
+            # Handle reset requests
+            if intent == "reset":
+                self.conversational_form.reset()
+                return ("🔄 I've reset everything. How can I help you today?\n\n"
+                       "• Ask questions about uploaded documents\n"
+                       "• Say 'I want to book an appointment' to schedule a meeting")
+
+            # Search documents if available
+            if intent == "document_search":
+                try:
+                    return self._search_documents(user_input)
+                except Exception as e:
+                    print(f"❌ Document search failed: {e}")
+                    return f"📄 Document search failed: {str(e)}"
+
+            # No documents loaded
+            return ("📄 No documents are currently uploaded. Please upload documents to get started!\n\n"
+                   "I can also help you:\n"
+                   "• Book appointments (say 'I want to book an appointment')")
+
+    def _route_intent(self, user_input: str) -> str:
+        """Decide which handler a message goes to"""
+        user_lower = user_input.lower().strip()
+
         if self.conversational_form.current_step == "collecting":
-            return self._handle_booking_flow(user_input)
-        
-        # Handle booking requests
+            return "booking_flow"
+
         booking_keywords = ['book', 'appointment', 'call me','call', 'contact me', 'schedule', 'meeting']
         if any(keyword in user_lower for keyword in booking_keywords):
-            self.conversational_form.current_step = "collecting"
-            return "I'd be happy to help you book an appointment! 📅\n\nLet's start with your full name:"
-        
-        # Handle reset requests
+            return "booking_start"
+
         if any(word in user_lower for word in ["reset", "start over", "clear", "restart"]):
-            self.conversational_form.reset()
-            return ("🔄 I've reset everything. How can I help you today?\n\n"
-                   "• Ask questions about uploaded documents\n"
-                   "• Say 'I want to book an appointment' to schedule a meeting")
-        
-        # Search documents if available
+            return "reset"
+
         if self.document_processor.vectorstore:
-            print("📄 Searching documents...")
-            try:
-                return self._search_documents(user_input)
-            except Exception as e:
-                print(f"❌ Document search failed: {e}")
-                return f"📄 Document search failed: {str(e)}"
-        
-        # No documents loaded
-        return ("📄 No documents are currently uploaded. Please upload documents to get started!\n\n"
-               "I can also help you:\n"
-               "• Book appointments (say 'I want to book an appointment')")
+            return "document_search"
+
+        return "no_documents"
 
     def _handle_booking_flow(self, user_input: str) -> str:
         """Handle booking conversation flow"""
@@ -179,35 +229,56 @@ class SimpleChatbot:
             if not self.document_processor.vectorstore:
                 return "📄 No documents loaded."
             
+            results = []
+            
+            # Scope the search when the question names a file or page
+            sources = self.document_processor.resolve_sources(query)
+            pages = [int(p) for p in re.findall(r'\bpage\s+(\d+)', query.lower())]
+            if sources or pages:
+                results = self.document_processor.filtered_search(query, k=3, sources=sources, pages=pages)
+            
             # Try direct search
-            results = self.document_processor.similarity_search(query, k=3)
+            if not results:
+                results = self.document_processor.similarity_search(query, k=3)
             
             # If no results, try broader search
             if not results:
-                keywords = query.lower().split()
-                for keyword in keywords[:3]:
-                    if len(keyword) > 3:
-                        results = self.document_processor.similarity_search(keyword, k=3)
-                        if results:
-                            break
+                with metrics.timer("fallback_search", kind="keyword"):
+                    keywords = query.lower().split()
+                    for keyword in keywords[:3]:
+                        if len(keyword) > 3:
+                            metrics.increment("fallback_searches", kind="keyword")
+                            results = self.document_processor.similarity_search(keyword, k=3)
+                            if results:
+                                break
             
             # If still no results, get any content
             if not results:
-                results = self.document_processor.similarity_search("", k=3)
+                with metrics.timer("fallback_search", kind="any"):
+                    metrics.increment("fallback_searches", kind="any")
+                    results = self.document_processor.similarity_search("", k=3)
             
             if results:
-                response = "📄 **Here's what I found:**\n\n"
-                
-                for i, doc in enumerate(results[:2]):
-                    content = doc.page_content.strip()
-                    if len(content) > 300:
-                        content = content[:300] + "..."
+                with metrics.timer("formatting"):
+                    response = "📄 **Here's what I found:**\n\n"
                     
-                    response += f"{content}\n\n"
-                
-                response += "❓ Would you like me to search for something specific?"
+                    for i, doc in enumerate(results[:2]):
+                        content = doc.page_content.strip()
+                        if len(content) > 300:
+                            content = content[:300] + "..."
+                        
+                        citation = doc.metadata.get("source", "")
+                        if "page" in doc.metadata:
+                            citation += f", page {doc.metadata['page']}"
+                        
+                        response += f"{content}\n\n"
+                        if citation:
+                            response += f"_📁 {citation}_\n\n"
+                    
+                    response += "❓ Would you like me to search for something specific?"
                 return response
             else:
+                metrics.increment("empty_searches")
                 return "📄 I couldn't find relevant content. Try asking about specific topics in your document."
                 
         except Exception as e:
@@ -2,10 +2,15 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from agents.simple_chatbot import SimpleChatbot
+from utils.metrics import metrics, start_metrics_server
 
 # loading environment variables
 load_dotenv()
 
+# optional Prometheus scrape endpoint
+if os.getenv("METRICS_PORT"):
+    start_metrics_server(int(os.getenv("METRICS_PORT")))
+
 # page configuration
 st.set_page_config(
     page_title="Welcome to AI Conversational Chatbot",
@@ -20,6 +25,41 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "documents_loaded" not in st.session_state:
     st.session_state.documents_loaded = False
+if "ingestion_job_id" not in st.session_state:
+    st.session_state.ingestion_job_id = None
+
+
+@st.fragment(run_every=1)
+def ingestion_progress():
+    """Poll the background ingestion job without blocking the chat"""
+    job_id = st.session_state.ingestion_job_id
+    status = st.session_state.chatbot.get_ingestion_status(job_id)
+    if status is None:
+        st.session_state.ingestion_job_id = None
+        return
+
+    if status["status"] in ("queued", "running"):
+        if status["current_file"]:
+            label = f"📄 Extracting {status['current_file']} ({status['files_done']}/{status['files_total']} files)"
+        elif status["chunks_total"]:
+            label = f"🧠 Embedding chunks {status['chunks_done']}/{status['chunks_total']}"
+        else:
+            label = "⏳ Queued..."
+        st.progress(status["progress"], text=label)
+        if st.button("⛔ Cancel processing"):
+            st.session_state.chatbot.cancel_ingestion(job_id)
+        return
+
+    # job finished - update the session and rerun the full app once
+    st.session_state.ingestion_job_id = None
+    if status["status"] == "completed":
+        st.session_state.documents_loaded = True
+        st.session_state.ingestion_result = f"✅ Processed {status['files_total']} documents!"
+    elif status["status"] == "cancelled":
+        st.session_state.ingestion_result = "⛔ Document processing cancelled"
+    else:
+        st.session_state.ingestion_result = f"❌ Document processing failed! {status['error'] or ''}"
+    st.rerun()
 
 def main():
     st.title("🤖 Welcome to AI Conversational Chatbot")
@@ -53,34 +93,30 @@ def main():
         
         if uploaded_files:
             if st.button("🔄 Process Documents"):
-                with st.spinner("Processing documents..."):
-                    try:
-                        # initializing chatbot if needed
-                        if not st.session_state.chatbot:
-                            st.session_state.chatbot = SimpleChatbot(api_key)                        
-                       
-                        st.session_state.chatbot.clear_documents()
-                        
-                        
-                        success = st.session_state.chatbot.setup_documents(uploaded_files)
-                        
-                        if success:
-                            st.session_state.documents_loaded = True
-                            st.success(f"✅ Processed {len(uploaded_files)} documents!")
-                            
-                            for file in uploaded_files:
-                                st.text(f"📁 {file.name} - {file.size} bytes")
-                        else:
-                            st.error("❌ Document processing failed!")
-                            st.session_state.documents_loaded = False
-                            
-                    except Exception as e:
-                        st.error(f"Error: {e}")
-                        st.session_state.documents_loaded = False
+                try:
+                    # initializing chatbot if needed
+                    if not st.session_state.chatbot:
+                        st.session_state.chatbot = SimpleChatbot(api_key)
+
+                    # only one ingestion per session at a time
+                    if st.session_state.ingestion_job_id:
+                        st.session_state.chatbot.cancel_ingestion(st.session_state.ingestion_job_id)
+
+                    # indexing runs in the background; chat keeps using the current index
+                    st.session_state.ingestion_job_id = st.session_state.chatbot.submit_documents(uploaded_files)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+
+        if st.session_state.ingestion_job_id and st.session_state.chatbot:
+            ingestion_progress()
         
         # showing status
+        if st.session_state.get("ingestion_result"):
+            st.text(st.session_state.pop("ingestion_result"))
         if st.session_state.documents_loaded:
             st.success("✅ Documents ready for questions!")
+        elif st.session_state.ingestion_job_id:
+            st.info("📄 Processing documents in the background...")
         elif uploaded_files:
             st.info("📄 Click 'Process Documents' to load files")
         else:
@@ -88,6 +124,9 @@ def main():
         
         if st.button("🗑️ Clear Documents"):
             if st.session_state.chatbot:
+                if st.session_state.ingestion_job_id:
+                    st.session_state.chatbot.cancel_ingestion(st.session_state.ingestion_job_id)
+                    st.session_state.ingestion_job_id = None
                 st.session_state.chatbot.clear_documents()
                 st.session_state.documents_loaded = False
                 st.success("✅ Documents cleared!")
@@ -123,6 +162,14 @@ def main():
                 st.session_state.chatbot.conversational_form.reset()
                 st.success("Booking reset!")
                 st.rerun()
+
+            st.divider()
+
+            # Performance metrics
+            with st.expander("📊 Metrics"):
+                info = st.session_state.chatbot.document_processor.get_vectorstore_info()
+                st.text(f"Chunks: {info['chunk_count']} | Bytes: {info['bytes']} | Sources: {len(info['sources'])}")
+                st.code(metrics.render_prometheus(), language="text")
     
     # Main chat interface
     if st.session_state.chatbot is None:
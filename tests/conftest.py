@@ -0,0 +1,5 @@
+import os
+import sys
+
+# make the top-level utils / agents packages importable when running plain `pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,257 @@
+import copy
+import pickle
+import threading
+import time
+
+import pytest
+
+from utils.call_gate import (
+    CallGate, FairRateLimiter, GatedChatModel, GatedEmbeddings, SingleFlight, api_key_id
+)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+def _queued(limiter, session_id):
+    with limiter._cond:
+        return len(limiter._queues.get(session_id, ()))
+
+
+#---- SingleFlight
+def test_single_flight_shares_one_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", slow))) for _ in range(5)]
+    threads[0].start()
+    _wait_for(lambda: calls)
+    for t in threads[1:]:
+        t.start()
+    _wait_for(lambda: all(t.is_alive() for t in threads))
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+
+
+def test_single_flight_shares_exceptions_and_forgets_finished_keys():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError("boom")
+
+    errors = []
+
+    def run():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    threads[0].start()
+    _wait_for(lambda: calls)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert calls == [1]
+    assert errors == ["boom"] * 3
+    # the key is no longer in flight, so the next call runs again
+    assert flight.do("key", lambda: "fresh") == "fresh"
+
+
+#---- FairRateLimiter
+def test_rate_limiter_grants_round_robin_across_sessions():
+    limiter = FairRateLimiter(rate=0, burst=1, max_concurrency=1)
+    limiter.acquire("holder")
+    order = []
+
+    def worker(session_id, label):
+        limiter.acquire(session_id)
+        order.append(label)
+        limiter.release()
+
+    # queue A1, A2, A3 from session A before B1 from session B
+    threads = []
+    for session_id, label, queued in [("A", "A1", 1), ("A", "A2", 2), ("A", "A3", 3), ("B", "B1", 1)]:
+        t = threading.Thread(target=worker, args=(session_id, label))
+        t.start()
+        _wait_for(lambda s=session_id, n=queued: _queued(limiter, s) == n)
+        threads.append(t)
+
+    limiter.release()
+    for t in threads:
+        t.join(5)
+
+    assert order == ["A1", "B1", "A2", "A3"]
+
+
+def test_rate_limiter_token_bucket_delays_after_burst():
+    limiter = FairRateLimiter(rate=20, burst=2, max_concurrency=0)
+    start = time.monotonic()
+    for _ in range(2):
+        limiter.acquire("s")
+        limiter.release()
+    burst_elapsed = time.monotonic() - start
+
+    for _ in range(2):
+        limiter.acquire("s")
+        limiter.release()
+    total_elapsed = time.monotonic() - start
+
+    assert burst_elapsed < 0.04
+    # two more tokens at 20/s take at least ~0.1s to refill
+    assert total_elapsed >= 0.09
+
+
+def test_call_gate_caps_concurrency():
+    gate = CallGate(rate=0, burst=1, max_concurrency=2)
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def call():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=gate.call, args=(f"s{i}", call)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert peak[0] == 2
+
+
+#---- Gated clients
+class _CountingEmbeddings:
+    model = "fake"
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.release.wait(5)
+        return [float(len(text))]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(t))] for t in texts]
+
+
+def test_gated_embeddings_coalesce_identical_queries_across_sessions():
+    gate = CallGate(rate=0, burst=1, max_concurrency=0)
+    inner = _CountingEmbeddings()
+    clients = [GatedEmbeddings(inner, f"session{i}", gate) for i in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(c.embed_query("same"))) for c in clients]
+    threads[0].start()
+    _wait_for(lambda: inner.calls == 1)
+    for t in threads[1:]:
+        t.start()
+    time.sleep(0.05)
+    inner.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert inner.calls == 1
+    assert results == [[4.0]] * 4
+
+
+class _KeyedLLM:
+    """Chat model whose calls fail for a bad API key"""
+    model = "fake"
+
+    def __init__(self, api_key, started):
+        self.api_key = api_key
+        self.started = started
+        self.release = threading.Event()
+
+    def invoke(self, input, config=None):
+        self.started.append(self.api_key)
+        self.release.wait(5)
+        if self.api_key == "bad":
+            raise PermissionError("invalid API key")
+        return f"{self.api_key}: {input}"
+
+
+def test_identical_calls_with_different_api_keys_are_not_shared():
+    gate = CallGate(rate=0, burst=1, max_concurrency=0)
+    started = []
+    bad = GatedChatModel(_KeyedLLM("bad", started), "s1", gate, key_id=api_key_id("bad"))
+    good = GatedChatModel(_KeyedLLM("good", started), "s2", gate, key_id=api_key_id("good"))
+    outcomes = {}
+
+    def run(name, model):
+        try:
+            outcomes[name] = model.invoke("same prompt")
+        except PermissionError as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=run, args=("bad", bad))]
+    threads[0].start()
+    _wait_for(lambda: started == ["bad"])
+    threads.append(threading.Thread(target=run, args=("good", good)))
+    threads[1].start()
+    _wait_for(lambda: len(started) == 2)
+    bad.llm.release.set()
+    good.llm.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert isinstance(outcomes["bad"], PermissionError)
+    assert outcomes["good"] == "good: same prompt"
+
+
+def test_each_api_key_gets_its_own_rate_limiter():
+    gate = CallGate(rate=1, burst=1, max_concurrency=0)
+    start = time.monotonic()
+    # one token per key: neither call waits for the other key's bucket to refill
+    gate.call("s1", lambda: None, key_id=api_key_id("one"))
+    gate.call("s2", lambda: None, key_id=api_key_id("two"))
+    assert time.monotonic() - start < 0.5
+    assert gate.limiter_for(api_key_id("one")) is not gate.limiter_for(api_key_id("two"))
+    assert api_key_id("one") != "one"
+
+
+def test_gated_chat_model_can_be_copied_and_pickled():
+    model = GatedChatModel("llm", "session", CallGate(rate=0, burst=1, max_concurrency=0))
+    clone = copy.copy(model)
+    assert clone.llm == "llm"
+
+    # an instance without llm must fail cleanly instead of recursing
+    bare = GatedChatModel.__new__(GatedChatModel)
+    with pytest.raises(AttributeError):
+        bare.llm
+    with pytest.raises(AttributeError):
+        bare.invoke_something
+    assert pickle.loads(pickle.dumps(bare)) is not None
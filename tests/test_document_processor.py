@@ -0,0 +1,114 @@
+import os
+import time
+
+import chromadb
+import pytest
+from langchain.schema import Document
+
+from utils.document_processor import DocumentProcessor, sweep_orphaned_collections
+
+
+@pytest.fixture
+def processor():
+    processor = DocumentProcessor("test-key")
+    chunks = [
+        Document(page_content="a", metadata={"source": "pricing_2024.pdf", "page": 1, "upload_time": "t"}),
+        Document(page_content="b", metadata={"source": "pricing_2024.pdf", "page": 3, "upload_time": "t"}),
+        Document(page_content="c", metadata={"source": "ai.pdf", "page": 1}),
+        Document(page_content="d", metadata={"source": "annual-report-2024.docx", "section": "Intro"}),
+        Document(page_content="e", metadata={"source": "notes.txt"}),
+    ]
+    processor.metadata_index = processor._build_metadata_index(chunks)
+
+    # record searches instead of embedding / querying
+    processor.searches = []
+
+    def fake_search(query, k=4, filter=None, sources=None):
+        processor.searches.append({"filter": filter, "sources": sources})
+        return []
+
+    processor.similarity_search = fake_search
+    return processor
+
+
+#---- Metadata index and filtered search
+def test_metadata_index_summarises_sources(processor):
+    entry = processor.metadata_index["pricing_2024.pdf"]
+    assert entry["pages"] == [1, 3]
+    assert entry["chunk_count"] == 2
+    assert entry["upload_time"] == "t"
+    assert processor.metadata_index["annual-report-2024.docx"]["sections"] == ["Intro"]
+
+
+def test_filtered_search_builds_chroma_where_filter(processor):
+    processor.filtered_search("q", sources=["pricing_2024.pdf"], pages=[3])
+    processor.filtered_search("q", section="Intro")
+
+    assert processor.searches == [
+        {
+            "filter": {"$and": [{"source": {"$in": ["pricing_2024.pdf"]}}, {"page": {"$in": [3]}}]},
+            "sources": ["pricing_2024.pdf"],
+        },
+        {"filter": {"section": "Intro"}, "sources": None},
+    ]
+
+
+def test_filtered_search_skips_unknown_sources_without_searching(processor):
+    assert processor.filtered_search("q", sources=["missing.pdf"]) == []
+    assert processor.searches == []
+
+
+def test_filtered_search_without_conditions_is_unfiltered(processor):
+    processor.filtered_search("q")
+    assert processor.searches == [{"filter": None, "sources": None}]
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("what does the pricing PDF say?", ["pricing_2024.pdf"]),
+    ("in pricing_2024.pdf what is on page 3", ["pricing_2024.pdf"]),
+    ("summarize the annual report 2024", ["annual-report-2024.docx"]),
+    ("what's in the AI pdf", ["ai.pdf"]),
+    ("check the notes file", ["notes.txt"]),
+    ("what is the pricing?", []),
+    ("maintenance schedule?", []),
+    ("any final notes or data?", []),
+])
+def test_resolve_sources_needs_an_explicit_file_reference(processor, message, expected):
+    assert processor.resolve_sources(message) == expected
+
+
+#---- Orphaned collection sweep
+def test_sweep_drops_only_stale_or_legacy_index_collections(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    now = time.time()
+    client.create_collection("langchain")
+    client.create_collection("documents_crashed", metadata={"created_at": now - 3 * 86400})
+    client.create_collection("documents_unstamped")
+    live = client.create_collection("documents_live", metadata={"created_at": now})
+    crashed = client.get_collection("documents_crashed")
+    for collection in (live, crashed):
+        collection.add(ids=["1", "2"], embeddings=[[1.0, 0.0], [0.0, 1.0]])
+    client.create_collection("someone_else", metadata={"created_at": now - 3 * 86400})
+
+    old_shard = tmp_path / "shards" / "documents_abc_shard0"
+    live_shard = tmp_path / "shards" / "documents_def_shard0"
+    for shard in (old_shard, live_shard):
+        shard.mkdir(parents=True)
+        (shard / "chroma.sqlite3").write_bytes(b"")
+    stale = now - 3 * 86400
+    os.utime(old_shard / "chroma.sqlite3", (stale, stale))
+    os.utime(old_shard, (stale, stale))
+
+    assert sweep_orphaned_collections(str(tmp_path), max_age=86400) == 4
+
+    assert sorted(c.name for c in client.list_collections()) == ["documents_live", "someone_else"]
+    # the dropped collection's vector segment is removed from disk, the live one stays
+    segments = [p for p in tmp_path.iterdir() if p.is_dir() and p.name != "shards"]
+    assert len(segments) == 1
+    assert live.count() == 2
+    assert not old_shard.exists()
+    assert live_shard.exists()
+
+
+def test_sweep_skips_a_directory_without_an_index(tmp_path):
+    assert sweep_orphaned_collections(str(tmp_path / "missing")) == 0
@@ -0,0 +1,167 @@
+import io
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from utils import document_processor as document_processor_module
+from utils.document_processor import DocumentProcessor, sweep_orphaned_collections
+from utils.ingestion_queue import IngestionQueue
+
+
+class _Upload(io.BytesIO):
+    """Stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, name, text):
+        data = text.encode("utf-8")
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+class _GatedFakeEmbeddings(Embeddings):
+    """Deterministic embeddings; embed_documents blocks while paused"""
+
+    def __init__(self):
+        self.running = threading.Event()
+        self.running.set()
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        self.running.wait(5)
+        return [self.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), float(sum(map(ord, text[:20])) % 97), 1.0]
+
+
+def _text(word):
+    # three ~300 character paragraphs -> three chunks
+    return "\n\n".join(f"{word} paragraph {i}. " + "lorem ipsum " * 25 for i in range(3))
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    # one chunk per batch, so progress and cancellation are checked between chunks
+    monkeypatch.setattr(document_processor_module, "EMBED_BATCH_SIZE", 1)
+    processor = DocumentProcessor("test-key", num_shards=1)
+    processor.persist_directory = str(tmp_path)
+    processor.embeddings = _GatedFakeEmbeddings()
+    yield processor
+    processor.embeddings.running.set()
+    processor.clear_vectorstore()
+
+
+@pytest.fixture
+def queue():
+    queue = IngestionQueue(max_workers=2)
+    yield queue
+    queue._executor.shutdown(wait=True)
+
+
+def _directory_entries(processor):
+    return list(Path(processor.persist_directory).iterdir())
+
+
+def _status(queue, job_id):
+    return queue.status(job_id)["status"]
+
+
+def test_submit_reports_progress_until_completed(processor, queue):
+    processor.embeddings.running.clear()
+    job_id = queue.submit(processor, [_Upload("a.txt", _text("alpha"))])
+
+    _wait_for(lambda: processor.embeddings.batches)
+    snapshot = queue.status(job_id)
+    assert snapshot["status"] == "running"
+    assert snapshot["files_done"] == 1
+    assert snapshot["chunks_total"] == 3
+    assert 0.5 <= snapshot["progress"] < 1.0
+
+    processor.embeddings.running.set()
+    _wait_for(lambda: _status(queue, job_id) == "completed")
+    snapshot = queue.status(job_id)
+    assert snapshot["chunks_done"] == 3
+    assert snapshot["progress"] == 1.0
+    assert processor.list_sources().keys() == {"a.txt"}
+
+
+def test_cancel_during_embedding_keeps_the_old_index_serving(processor, queue):
+    assert processor.setup_documents([_Upload("old.txt", _text("old"))])
+    old_vectorstore = processor.vectorstore
+
+    processor.embeddings.running.clear()
+    job_id = queue.submit(processor, [_Upload("new.txt", _text("new"))])
+    _wait_for(lambda: len(processor.embeddings.batches) == 4)
+
+    # the new index is half built, the old one still answers
+    results = processor.similarity_search("old paragraph", k=1)
+    assert results[0].metadata["source"] == "old.txt"
+
+    assert queue.cancel(job_id)
+    processor.embeddings.running.set()
+    _wait_for(lambda: _status(queue, job_id) == "cancelled")
+
+    assert processor.vectorstore is old_vectorstore
+    assert processor.list_sources().keys() == {"old.txt"}
+    # the partial build was dropped, along with its segment on disk
+    assert processor._owned_vectorstores == [old_vectorstore]
+    assert len([p for p in _directory_entries(processor) if p.is_dir()]) == 1
+
+
+def test_jobs_for_one_processor_run_one_at_a_time(processor, queue):
+    processor.embeddings.running.clear()
+    first = queue.submit(processor, [_Upload("first.txt", _text("first"))])
+    _wait_for(lambda: processor.embeddings.batches)
+    second = queue.submit(processor, [_Upload("second.txt", _text("second"))])
+
+    # the second job waits for the processor and is not reported as running
+    time.sleep(0.1)
+    assert _status(queue, first) == "running"
+    assert _status(queue, second) == "queued"
+
+    processor.embeddings.running.set()
+    _wait_for(lambda: _status(queue, second) == "completed")
+    assert _status(queue, first) == "completed"
+    assert processor.list_sources().keys() == {"second.txt"}
+    assert len(processor._owned_vectorstores) == 1
+
+
+def test_job_cancelled_while_waiting_never_starts(processor, queue):
+    processor.embeddings.running.clear()
+    first = queue.submit(processor, [_Upload("first.txt", _text("first"))])
+    _wait_for(lambda: processor.embeddings.batches)
+    second = queue.submit(processor, [_Upload("second.txt", _text("second"))])
+
+    assert queue.cancel(second)
+    processor.embeddings.running.set()
+    _wait_for(lambda: _status(queue, second) == "cancelled")
+    _wait_for(lambda: _status(queue, first) == "completed")
+
+    assert queue.status(second)["files_done"] == 0
+    assert all("second" not in text for batch in processor.embeddings.batches for text in batch)
+    assert processor.list_sources().keys() == {"first.txt"}
+
+
+def test_finished_job_cannot_be_cancelled_and_unknown_jobs_have_no_status(processor, queue):
+    job_id = queue.submit(processor, [_Upload("a.txt", _text("alpha"))])
+    _wait_for(lambda: _status(queue, job_id) == "completed")
+    assert not queue.cancel(job_id)
+    assert queue.status("missing") is None
+
+
+def test_built_collection_survives_the_orphan_sweep(processor):
+    assert processor.setup_documents([_Upload("a.txt", _text("alpha"))])
+    assert sweep_orphaned_collections(processor.persist_directory) == 0
+    assert processor.similarity_search("alpha paragraph", k=1)[0].metadata["source"] == "a.txt"
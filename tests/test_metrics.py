@@ -0,0 +1,103 @@
+import urllib.error
+import urllib.request
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from utils import metrics as metrics_module
+from utils.metrics import LATENCY_BUCKETS, MetricsRegistry, metrics, start_metrics_server
+
+
+def _samples(text):
+    """Map 'name{labels}' to value for every sample line"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_cumulative_and_match_count():
+    registry = MetricsRegistry()
+    for seconds in (0.003, 0.02, 0.02, 0.4, 100.0):
+        registry.observe("embedding", seconds)
+
+    text = registry.render_prometheus()
+    samples = _samples(text)
+
+    assert "# TYPE chatbot_stage_seconds histogram" in text
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="0.005"}'] == 1
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="0.01"}'] == 1
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="0.025"}'] == 3
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="0.5"}'] == 4
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="60.0"}'] == 4
+    # the observation above every bound only shows up in +Inf
+    assert samples['chatbot_stage_seconds_bucket{stage="embedding",le="+Inf"}'] == 5
+    assert samples['chatbot_stage_seconds_count{stage="embedding"}'] == 5
+    assert samples['chatbot_stage_seconds_sum{stage="embedding"}'] == pytest.approx(100.443)
+    assert samples['chatbot_stage_max_seconds{stage="embedding"}'] == 100.0
+
+    counts = [samples[f'chatbot_stage_seconds_bucket{{stage="embedding",le="{b}"}}'] for b in LATENCY_BUCKETS]
+    assert counts == sorted(counts)
+
+
+def test_counters_render_with_labels_and_escaping():
+    registry = MetricsRegistry()
+    registry.increment("documents_ingested", file_type=".pdf")
+    registry.increment("documents_ingested", file_type=".pdf")
+    registry.increment("search_errors", reason='bad "quote"\\path\nline')
+
+    text = registry.render_prometheus()
+    samples = _samples(text)
+
+    assert "# TYPE chatbot_documents_ingested_total counter" in text
+    assert samples['chatbot_documents_ingested_total{file_type=".pdf"}'] == 2
+    assert 'chatbot_search_errors_total{reason="bad \\"quote\\"\\\\path\\nline"} 1' in text
+
+
+def test_empty_registry_renders_no_samples():
+    assert MetricsRegistry().render_prometheus() == "\n"
+
+
+def test_timer_records_a_stage_and_an_otel_span(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(metrics_module, "_tracer", provider.get_tracer("test"))
+
+    registry = MetricsRegistry()
+    with pytest.raises(ValueError):
+        with registry.timer("llm_call", intent="chat"):
+            raise ValueError("boom")
+
+    # the failed call is still timed
+    assert registry.snapshot()["stages"]['{intent="chat",stage="llm_call"}']["count"] == 1
+    spans = exporter.get_finished_spans()
+    assert [span.name for span in spans] == ["chatbot.llm_call"]
+    assert spans[0].attributes["intent"] == "chat"
+
+
+def test_timer_without_otel(monkeypatch):
+    monkeypatch.setattr(metrics_module, "_tracer", None)
+    registry = MetricsRegistry()
+    with registry.timer("splitting"):
+        pass
+    assert registry.snapshot()["stages"]['{stage="splitting"}']["count"] == 1
+
+
+def test_scrape_endpoint_serves_the_process_registry():
+    assert start_metrics_server(0, host="127.0.0.1")
+    port = metrics_module._server.server_address[1]
+    metrics.increment("scrape_test")
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        body = response.read().decode("utf-8")
+    assert "chatbot_scrape_test_total 1" in body
+
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    assert error.value.code == 404
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from utils import profiling
+from utils.metrics import metrics
+from utils.profiling import RequestProfiler, profiled
+
+
+@pytest.fixture
+def use_profiler(monkeypatch, tmp_path):
+    def install(sample_rate, modes="cprofile,tracemalloc"):
+        profiler = RequestProfiler(sample_rate, str(tmp_path / "profiles"), modes)
+        monkeypatch.setattr(profiling, "profiler", profiler)
+        return profiler
+    return install
+
+
+@profiled("work", metadata=lambda n: {"n": n})
+def _work(n):
+    return sum(range(n))
+
+
+def _skipped():
+    return metrics.snapshot()["counters"].get('profile_skipped{call="work"}', 0)
+
+
+def test_zero_sample_rate_never_enters_the_profiler(use_profiler, monkeypatch):
+    profiler = use_profiler(0)
+    monkeypatch.setattr(profiler, "run", lambda *a, **k: pytest.fail("profiler.run called"))
+
+    assert _work(10) == 45
+    assert not os.path.exists(profiler.output_dir)
+
+
+def test_sampled_call_writes_reports_with_metadata(use_profiler):
+    profiler = use_profiler(1)
+
+    assert _work(1000) == 499500
+
+    files = sorted(os.listdir(profiler.output_dir))
+    prefix = files[0].split(".")[0]
+    assert files == sorted(prefix + suffix for suffix in (".json", ".prof", "_allocations.txt", "_cprofile.txt"))
+
+    report_name = next(name for name in files if name.endswith(".json"))
+    with open(os.path.join(profiler.output_dir, report_name), encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["name"] == "work"
+    assert report["metadata"] == {"n": 1000}
+    assert report["error"] is None
+    assert report["modes"] == ["cprofile", "tracemalloc"]
+    assert "peak_traced_memory_bytes" in report
+
+
+def test_modes_limit_the_reports_written(use_profiler):
+    profiler = use_profiler(1, modes="cprofile")
+    _work(10)
+    files = os.listdir(profiler.output_dir)
+    assert not any(name.endswith("_allocations.txt") for name in files)
+    assert any(name.endswith(".prof") for name in files)
+
+
+def test_call_overlapping_a_profiled_call_is_skipped_and_counted(use_profiler):
+    profiler = use_profiler(1)
+    skipped = _skipped()
+
+    # as if another call were being profiled
+    with profiler._lock:
+        assert _work(10) == 45
+
+    assert not os.path.exists(profiler.output_dir)
+    assert _skipped() == skipped + 1
+
+
+def test_failed_call_is_profiled_and_reraised(use_profiler):
+    profiler = use_profiler(1)
+
+    @profiled("failing")
+    def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        failing()
+
+    report_name = next(name for name in os.listdir(profiler.output_dir) if name.endswith(".json"))
+    with open(os.path.join(profiler.output_dir, report_name), encoding="utf-8") as f:
+        assert json.load(f)["error"] == "ValueError('boom')"
+    assert not profiler._lock.locked()
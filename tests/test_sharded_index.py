@@ -0,0 +1,128 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+from langchain.schema import Document
+
+from utils import sharded_index
+from utils.sharded_index import LocalShard, ShardedVectorStore, ShardSearchError, shard_for
+
+
+class _FakeShard:
+    """Shard that answers from a fixed hit list, or fails"""
+
+    def __init__(self, hits=None, error=None):
+        self.hits = hits or []
+        self.error = error
+        self.searched = 0
+
+    def submit_search(self, kind, embedding, k, where=None):
+        self.searched += 1
+        future = Future()
+        if self.error:
+            future.set_exception(self.error)
+        else:
+            future.set_result(sorted(self.hits)[:k])
+        return future
+
+
+def _store(shards, shard_by="hash"):
+    store = ShardedVectorStore.__new__(ShardedVectorStore)
+    store.shards = shards
+    store.shard_by = shard_by
+    store.workers = "thread"
+    return store
+
+
+def test_shard_for_is_stable_and_in_range():
+    doc = Document(page_content="text", metadata={"source": "a.pdf"})
+    assert shard_for(doc, 4, "source") == shard_for(doc, 4, "source")
+    for i in range(50):
+        doc = Document(page_content=f"chunk {i}", metadata={"source": f"file{i}.pdf"})
+        assert 0 <= shard_for(doc, 4, "hash") < 4
+
+
+def test_shard_by_source_keeps_a_file_together_and_hash_spreads_it():
+    chunks = [Document(page_content=f"chunk {i}", metadata={"source": "big.pdf"}) for i in range(40)]
+    assert len({shard_for(c, 4, "source") for c in chunks}) == 1
+    assert len({shard_for(c, 4, "hash") for c in chunks}) > 1
+
+
+def test_search_merges_per_shard_top_k_by_distance():
+    store = _store([
+        _FakeShard([(0.5, "a", {}), (0.1, "b", {})]),
+        _FakeShard([(0.3, "c", {}), (0.05, "d", {}), (0.9, "e", {})]),
+    ])
+    results = store.similarity_search_by_vector([0.0], k=3)
+    assert [d.page_content for d in results] == ["d", "b", "c"]
+
+
+def test_search_tolerates_partial_shard_failure():
+    store = _store([_FakeShard(error=RuntimeError("down")), _FakeShard([(0.2, "ok", {"source": "x"})])])
+    results = store.similarity_search_by_vector([0.0], k=2)
+    assert [d.page_content for d in results] == ["ok"]
+    assert results[0].metadata == {"source": "x"}
+
+
+def test_search_raises_when_every_shard_fails():
+    store = _store([_FakeShard(error=RuntimeError("down")), _FakeShard(error=RuntimeError("down"))])
+    with pytest.raises(ShardSearchError):
+        store.similarity_search_by_vector([0.0], k=2)
+
+
+def test_source_filter_prunes_shards_when_sharding_by_source():
+    shards = [_FakeShard() for _ in range(4)]
+    store = _store(shards, shard_by="source")
+    target = shard_for(Document(page_content="", metadata={"source": "pricing.pdf"}), 4, "source")
+
+    store.similarity_search_by_vector([0.0], k=2, sources=["pricing.pdf"])
+
+    assert [s.searched for s in shards] == [1 if i == target else 0 for i in range(4)]
+
+
+def test_source_filter_searches_every_shard_when_sharding_by_hash():
+    shards = [_FakeShard() for _ in range(3)]
+    store = _store(shards, shard_by="hash")
+    store.similarity_search_by_vector([0.0], k=2, sources=["pricing.pdf"])
+    assert [s.searched for s in shards] == [1, 1, 1]
+
+
+class _FakeVectorstore:
+    def __init__(self):
+        self.deleted = False
+
+    def delete_collection(self):
+        self.deleted = True
+
+
+def _local_shard(index, persist_directory):
+    shard = LocalShard.__new__(LocalShard)
+    shard.index = index
+    shard.persist_directory = persist_directory
+    shard.collection_name = f"documents_test_shard{index}"
+    shard.vectorstore = _FakeVectorstore()
+    return shard
+
+
+def test_process_shard_delete_skips_reset_after_pool_shutdown(tmp_path, monkeypatch, capsys):
+    # as at interpreter exit: the finalizer runs after the worker pool has shut down
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.shutdown()
+    monkeypatch.setitem(sharded_index._process_executors, 7, executor)
+    shard = _local_shard(7, str(tmp_path / "shard7"))
+    os.makedirs(shard.persist_directory)
+
+    store = _store([shard])
+    store.workers = "process"
+    store.delete_collection()
+
+    assert shard.vectorstore.deleted
+    assert not os.path.exists(shard.persist_directory)
+    assert capsys.readouterr().out == ""
+
+
+def test_process_shard_delete_without_worker_does_not_start_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharded_index, "_process_executors", {})
+    shard = _local_shard(3, str(tmp_path / "shard3"))
+    shard.delete("process")
+    assert sharded_index._process_executors == {}
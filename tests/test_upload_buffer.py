@@ -0,0 +1,113 @@
+import io
+
+import docx
+import pytest
+
+from utils.document_processor import DocumentProcessor
+from utils.upload_buffer import MappedFile, UploadTooLargeError, spooled_upload
+
+
+class _Upload(io.BytesIO):
+    """Stand-in for a Streamlit UploadedFile"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def _pdf_bytes(pages):
+    """Build a minimal PDF with one line of text per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _docx_bytes():
+    document = docx.Document()
+    document.add_paragraph("Preamble text")
+    document.add_heading("Pricing", level=1)
+    document.add_paragraph("Plans start at ten dollars")
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def processor():
+    return DocumentProcessor("test-key")
+
+
+#---- Upload buffering
+def test_small_upload_stays_in_memory():
+    with spooled_upload(_Upload("a.txt", b"x" * 100), 1024, 10_000) as buffer:
+        assert not isinstance(buffer, MappedFile)
+        assert buffer.read() == b"x" * 100
+
+
+@pytest.mark.parametrize("threshold", [0, 10])
+def test_large_or_disk_only_upload_is_memory_mapped(threshold):
+    with spooled_upload(_Upload("a.txt", b"y" * 100), threshold, 10_000) as buffer:
+        assert isinstance(buffer, MappedFile)
+        assert buffer.seekable()
+        assert buffer.read(10) == b"y" * 10
+        buffer.seek(-5, io.SEEK_END)
+        assert buffer.tell() == 95
+        assert buffer.read() == b"y" * 5
+
+
+def test_oversized_upload_is_rejected():
+    with pytest.raises(UploadTooLargeError):
+        with spooled_upload(_Upload("a.txt", b"z" * 100), 10, 50):
+            pass
+
+
+#---- Extraction from disk-backed uploads
+def test_txt_extraction_decodes_mapped_upload(processor):
+    data = "héllo wörld".encode("utf-8")
+    with spooled_upload(_Upload("a.txt", data), 0, 10_000) as buffer:
+        assert processor._extract_sections(buffer, ".txt", "a.txt") == [("héllo wörld", {})]
+
+
+@pytest.mark.parametrize("threshold", [0, 1024 * 1024])
+def test_pdf_extraction_from_mapped_and_memory_upload(processor, threshold):
+    upload = _Upload("a.pdf", _pdf_bytes(["First page", "Second page"]))
+    with spooled_upload(upload, threshold, 10_000_000) as buffer:
+        sections = processor._extract_sections(buffer, ".pdf", "a.pdf")
+    assert sections == [("First page", {"page": 1}), ("Second page", {"page": 2})]
+
+
+@pytest.mark.parametrize("threshold", [0, 1024 * 1024])
+def test_docx_extraction_from_mapped_and_memory_upload(processor, threshold):
+    with spooled_upload(_Upload("a.docx", _docx_bytes()), threshold, 10_000_000) as buffer:
+        sections = processor._extract_sections(buffer, ".docx", "a.docx")
+    assert sections == [
+        ("Preamble text", {}),
+        ("Pricing\n\nPlans start at ten dollars", {"section": "Pricing"}),
+    ]
+
+
+def test_unreadable_upload_yields_no_sections(processor):
+    with spooled_upload(_Upload("a.docx", b"not a zip file"), 0, 10_000) as buffer:
+        assert processor._extract_sections(buffer, ".docx", "a.docx") == []
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import metrics
+
+# Client-side limits for Gemini API calls, shared by every session using the same API key
+GEMINI_REQUESTS_PER_SECOND = float(os.getenv("GEMINI_REQUESTS_PER_SECOND", 5))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", 10))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))
+
+
+#---- Request coalescing
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not leader:
+            metrics.increment("coalesced_calls")
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+#---- Rate limiting
+class FairRateLimiter:
+    """
+    Token bucket plus concurrency cap. Waiters queue per session and are
+    granted round-robin across sessions, so one busy session cannot starve
+    the others. A rate or concurrency of 0 disables that limit.
+    """
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._active = 0
+        # session id -> waiting tickets; the first session is served next
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _can_grant(self, session_id: str, ticket) -> bool:
+        if next(iter(self._queues)) != session_id or self._queues[session_id][0] is not ticket:
+            return False
+        if self.max_concurrency and self._active >= self.max_concurrency:
+            return False
+        return self.rate <= 0 or self._tokens >= 1
+
+    def acquire(self, session_id: str):
+        """Block until this session's turn, a token and a concurrency slot are available"""
+        ticket = object()
+        start = time.perf_counter()
+        with self._cond:
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            while True:
+                self._refill()
+                if self._can_grant(session_id, ticket):
+                    break
+                # Wake up when the next token is due, or when a slot is released
+                wait = None
+                if self.rate > 0 and self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                self._cond.wait(wait)
+
+            queue = self._queues[session_id]
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(session_id)
+            else:
+                del self._queues[session_id]
+            if self.rate > 0:
+                self._tokens -= 1
+            self._active += 1
+            self._cond.notify_all()
+
+        metrics.observe("rate_limit_wait", time.perf_counter() - start)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+
+#---- Shared call layer
+def api_key_id(api_key: str) -> str:
+    """Stable, non-reversible identity of an API key for scoping shared calls"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class CallGate:
+    """
+    Rate limits and coalesces API calls. Quotas are per API key, so every key
+    gets its own limiter, and calls are only shared between sessions using the
+    same key - one user's invalid or exhausted key never fails another's call.
+    """
+
+    def __init__(self, rate: float = GEMINI_REQUESTS_PER_SECOND, burst: int = GEMINI_BURST,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.single_flight = SingleFlight()
+        self._limiters: Dict[str, FairRateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+
+    def limiter_for(self, key_id: str) -> FairRateLimiter:
+        with self._limiters_lock:
+            limiter = self._limiters.get(key_id)
+            if limiter is None:
+                limiter = FairRateLimiter(self.rate, self.burst, self.max_concurrency)
+                self._limiters[key_id] = limiter
+            return limiter
+
+    def call(self, session_id: str, fn: Callable[[], Any], key: Optional[Hashable] = None,
+             key_id: str = "") -> Any:
+        """Run fn under key_id's rate limit; identical in-flight keys with the same key_id share one call"""
+        if key is None:
+            return self._limited(session_id, fn, key_id)
+        return self.single_flight.do((key_id, key), lambda: self._limited(session_id, fn, key_id))
+
+    def _limited(self, session_id: str, fn: Callable[[], Any], key_id: str) -> Any:
+        limiter = self.limiter_for(key_id)
+        limiter.acquire(session_id)
+        try:
+            metrics.increment("api_calls")
+            return fn()
+        finally:
+            limiter.release()
+
+
+_default_gate = None
+_default_gate_lock = threading.Lock()
+
+
+def get_call_gate() -> CallGate:
+    """Get the process-wide call gate shared by all sessions"""
+    global _default_gate
+    with _default_gate_lock:
+        if _default_gate is None:
+            _default_gate = CallGate()
+        return _default_gate
+
+
+#---- Gated clients
+class GatedEmbeddings(Embeddings):
+    """Embeddings wrapper that routes every API call through the call gate"""
+
+    def __init__(self, embeddings: Embeddings, session_id: str, gate: Optional[CallGate] = None,
+                 key_id: str = ""):
+        self.embeddings = embeddings
+        self.session_id = session_id
+        self.gate = gate or get_call_gate()
+        self.key_id = key_id
+        self._model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.gate.call(
+            self.session_id,
+            lambda: self.embeddings.embed_query(text),
+            key=("embed_query", self._model, text),
+            key_id=self.key_id,
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.gate.call(
+            self.session_id,
+            lambda: self.embeddings.embed_documents(texts),
+            key_id=self.key_id,
+        )
+
+
+class GatedChatModel:
+    """Chat model proxy that routes invoke() through the call gate"""
+
+    def __init__(self, llm, session_id: str, gate: Optional[CallGate] = None, key_id: str = ""):
+        self.llm = llm
+        self.session_id = session_id
+        self.gate = gate or get_call_gate()
+        self.key_id = key_id
+
+    def invoke(self, input, config=None, **kwargs):
+        # Only plain prompts without per-call options are safe to share
+        key = None
+        if isinstance(input, str) and config is None and not kwargs:
+            key = ("invoke", getattr(self.llm, "model", ""), input)
+        return self.gate.call(
+            self.session_id,
+            lambda: self.llm.invoke(input, config=config, **kwargs),
+            key=key,
+            key_id=self.key_id,
+        )
+
+    def __getattr__(self, name):
+        # copy / unpickle probe attributes before __init__ has set llm
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
@@ -1,17 +1,165 @@
 import os
-from typing import List
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.schema import Document
-import shutil
+import uuid
+import weakref
+from utils.call_gate import GatedEmbeddings, api_key_id
+from utils.ingestion_queue import IngestionCancelled
+from utils.metrics import metrics
+from utils.profiling import profiled
+from utils.sharded_index import ShardedVectorStore, ShardSearchError, INDEX_SHARDS, INDEX_SHARD_BY
+from utils.upload_buffer import MappedFile, spooled_upload, UploadTooLargeError
+
+# Uploads larger than this are spooled to disk and memory-mapped
+SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", 8 * 1024 * 1024))
+# Uploads larger than this are rejected
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 200 * 1024 * 1024))
+# Chunks embedded per batch; progress and cancellation are checked between batches
+EMBED_BATCH_SIZE = 64
+
+EMBEDDINGS_MODEL = "models/embedding-001"
+
+# Unowned collections older than this are dropped by the startup sweep
+ORPHAN_COLLECTION_MAX_AGE = int(os.getenv("ORPHAN_COLLECTION_MAX_AGE", 24 * 3600))
+# Collection written by earlier versions that kept one shared index
+LEGACY_COLLECTION_NAME = "langchain"
+
+# Nouns that mark a file-name word as a reference to that file
+FILE_REFERENCE_WORDS = r"(?:pdfs?|docx?|txt|files?|documents?|docs)"
+
+
+def _normalize_words(text: str) -> str:
+    """Lowercase and collapse punctuation / underscores to single spaces"""
+    return " ".join(re.split(r"[\W_]+", text.lower())).strip()
+
+
+def _drop_vectorstores(vectorstores: list):
+    """Drop collections a processor still owns - runs when its session is garbage collected"""
+    for vectorstore in list(vectorstores):
+        try:
+            vectorstore.delete_collection()
+        except Exception as e:
+            print(f"Could not drop collection: {e}")
+        vectorstores.remove(vectorstore)
+
+
+def _newest_mtime(path: str) -> float:
+    mtimes = [os.path.getmtime(path)]
+    for entry in os.scandir(path):
+        mtimes.append(entry.stat().st_mtime)
+    return max(mtimes)
+
+
+def _remove_unreferenced_segments(persist_directory: str) -> int:
+    """
+    Remove segment directories no collection references. Chroma leaves a dropped
+    collection's vector segment on disk, so the persist directory would keep growing.
+    """
+    database = os.path.join(persist_directory, "chroma.sqlite3")
+    if not os.path.exists(database):
+        return 0
+    connection = sqlite3.connect(f"file:{database}?mode=ro", uri=True)
+    try:
+        referenced = {row[0] for row in connection.execute("SELECT id FROM segments")}
+    finally:
+        connection.close()
+
+    removed = 0
+    for entry in os.scandir(persist_directory):
+        if not entry.is_dir() or entry.name in referenced:
+            continue
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            # not a segment, e.g. the shards directory
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def sweep_orphaned_collections(persist_directory: str, max_age: float = ORPHAN_COLLECTION_MAX_AGE) -> int:
+    """
+    Drop index collections left behind by crashed or restarted processes. Collections are
+    stamped with created_at; older ones, and unstamped legacy ones, no longer have an owner.
+    Sharded indexes live in their own directories and are aged by modification time.
+    """
+    import chromadb
+
+    cutoff = time.time() - max_age
+    dropped = 0
+
+    if os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        client = chromadb.PersistentClient(path=persist_directory)
+        for collection in client.list_collections():
+            if not (collection.name.startswith("documents_") or collection.name == LEGACY_COLLECTION_NAME):
+                continue
+            created_at = (collection.metadata or {}).get("created_at")
+            if created_at is not None and float(created_at) >= cutoff:
+                continue
+            try:
+                client.delete_collection(collection.name)
+                dropped += 1
+            except Exception as e:
+                print(f"Could not drop orphaned collection {collection.name}: {e}")
+        _remove_unreferenced_segments(persist_directory)
+
+    shards_directory = os.path.join(persist_directory, "shards")
+    if os.path.isdir(shards_directory):
+        for entry in os.scandir(shards_directory):
+            if entry.is_dir() and entry.name.startswith("documents_") and _newest_mtime(entry.path) < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                dropped += 1
+
+    if dropped:
+        metrics.increment("orphaned_collections_dropped", dropped)
+        print(f"🧹 Dropped {dropped} orphaned collections from {persist_directory}")
+    return dropped
+
+
+# Persist directories already swept by this process
+_swept_directories = set()
+_sweep_lock = threading.Lock()
+
+
+def _sweep_once(persist_directory: str):
+    """Sweep a persist directory before this process first builds an index in it"""
+    with _sweep_lock:
+        directory = os.path.abspath(persist_directory)
+        if directory in _swept_directories:
+            return
+        _swept_directories.add(directory)
+        try:
+            sweep_orphaned_collections(persist_directory)
+        except Exception as e:
+            print(f"❌ Sweeping orphaned collections failed: {e}")
+
 
 #---- Document processing
 class DocumentProcessor:
-    def __init__(self, google_api_key: str):
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=google_api_key
+    def __init__(self, google_api_key: str,
+                 session_id: str = "default",
+                 spool_max_memory: int = SPOOL_MAX_MEMORY,
+                 max_upload_size: int = MAX_UPLOAD_SIZE,
+                 num_shards: int = INDEX_SHARDS,
+                 shard_by: str = INDEX_SHARD_BY):
+        # API calls are rate limited and coalesced across sessions using the same key
+        self.embeddings = GatedEmbeddings(
+            GoogleGenerativeAIEmbeddings(
+                model=EMBEDDINGS_MODEL,
+                google_api_key=google_api_key
+            ),
+            session_id=session_id,
+            key_id=api_key_id(google_api_key)
         )
         
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -20,179 +168,396 @@ class DocumentProcessor:
             length_function=len,
         )
         self.vectorstore = None
+        self.spool_max_memory = spool_max_memory
+        self.max_upload_size = max_upload_size
+        self.persist_directory = "./chroma_db"
+        self.num_shards = max(1, num_shards)
+        self.shard_by = shard_by
+        # Stats of the live index, recorded at ingest time
+        self.index_stats = {"chunk_count": 0, "bytes": 0, "sources": []}
+        # source -> pages / sections / upload time / chunk count of the live index
+        self.metadata_index: Dict[str, dict] = {}
+        # Collections this processor created (live and in-progress builds). The
+        # persist directory is shared by all sessions, so only these are ever dropped;
+        # collections of processes that died are reclaimed by sweep_orphaned_collections.
+        self._owned_vectorstores = []
+        weakref.finalize(self, _drop_vectorstores, self._owned_vectorstores)
+        # One ingestion at a time per processor; the swap is atomic with respect to clear
+        self._ingest_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
 
-    def setup_documents(self, uploaded_files):
-        """Setup documents directly from Streamlit uploaded files - NO TEMP FILES"""
+    def setup_documents(self, uploaded_files, job=None):
+        """
+        Setup documents from Streamlit uploaded files via spooled / memory-mapped buffers.
+        The previous index keeps serving searches until the new one is swapped in.
+        Runs for the same processor are serialized; a job cancelled while waiting never starts.
+        """
+        with self._ingest_lock:
+            if job:
+                job.start()
+            return self._setup_documents(uploaded_files, job)
+
+    # Profiled inside the ingest lock, so samples measure the work rather than the wait
+    @profiled("setup_documents", metadata=lambda self, uploaded_files, job=None: {
+        "files": [{"name": f.name, "size": getattr(f, "size", None)} for f in uploaded_files],
+        "job_id": job.id if job else None,
+    })
+    def _setup_documents(self, uploaded_files, job=None):
         try:
             print(f"🔧 Processing {len(uploaded_files)} files directly...")
             
-            # Clear old documents first
-            self.clear_vectorstore()
-            
             documents = []
+            upload_time = datetime.now().isoformat(timespec="seconds")
             
             for uploaded_file in uploaded_files:
+                if job:
+                    job.start_file(uploaded_file.name)
                 try:
                     print(f"📄 Processing: {uploaded_file.name}")
                     
-                    # Get file content as text
-                    content = ""
                     file_extension = os.path.splitext(uploaded_file.name)[1].lower()
-                    
-                    # handling text files
-                    if file_extension == '.txt':
-                        
-                        content = uploaded_file.getvalue().decode('utf-8')
-
-                    # handling pdf files    
-                    elif file_extension == '.pdf':
-                        
-                        try:
-                            import PyPDF2
-                            import io
-                            
-                            pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.getvalue()))
-                            text_parts = []
-                            
-                            for page in pdf_reader.pages:
-                                page_text = page.extract_text()
-                                if page_text and page_text.strip():
-                                    text_parts.append(page_text.strip())
-                            
-                            content = "\n\n".join(text_parts)
-                            
-                        except Exception as pdf_error:
-                            print(f"PDF extraction failed: {pdf_error}")
-                            content = f"Error extracting text from {uploaded_file.name}"
-                    
-                    # handling docx file
-                    elif file_extension == '.docx':
-                        
-                        try:
-                            import docx
-                            import io
-                            
-                            doc = docx.Document(io.BytesIO(uploaded_file.getvalue()))
-                            text_parts = []
-                            
-                            for paragraph in doc.paragraphs:
-                                if paragraph.text and paragraph.text.strip():
-                                    text_parts.append(paragraph.text.strip())
-                            
-                            content = "\n\n".join(text_parts)
-                            
-                        except Exception as docx_error:
-                            print(f"DOCX extraction failed: {docx_error}")
-                            content = f"Error extracting text from {uploaded_file.name}"
-                    
-                    else:
+                    if file_extension not in ('.txt', '.pdf', '.docx'):
                         print(f"Unsupported file type: {file_extension}")
                         continue
+
+                    # Parsers read straight from the spooled / memory-mapped buffer
+                    with spooled_upload(uploaded_file, self.spool_max_memory, self.max_upload_size) as buffer:
+                        with metrics.timer("extraction", file_type=file_extension):
+                            sections = self._extract_sections(buffer, file_extension, uploaded_file.name)
+                    
+                    sections = [(text.strip(), meta) for text, meta in sections if text and text.strip()]
+                    content_length = sum(len(text) for text, _ in sections)
                     
-                    # Create document if we have content
-                    if content and content.strip() and len(content.strip()) > 10:
-                        doc = Document(
-                            page_content=content.strip(),
-                            metadata={"source": uploaded_file.name}
-                        )
-                        documents.append(doc)
-                        print(f"✅ Extracted {len(content)} characters from {uploaded_file.name}")
+                    # Create documents if we have content
+                    if content_length > 10:
+                        for text, section_metadata in sections:
+                            documents.append(Document(
+                                page_content=text,
+                                metadata={
+                                    "source": uploaded_file.name,
+                                    "file_type": file_extension.lstrip('.'),
+                                    "upload_time": upload_time,
+                                    **section_metadata
+                                }
+                            ))
+                        metrics.increment("documents_ingested", file_type=file_extension)
+                        print(f"✅ Extracted {content_length} characters from {uploaded_file.name}")
                     else:
                         print(f"⚠️ No usable content found in {uploaded_file.name}")
                         
+                except UploadTooLargeError as e:
+                    print(f"❌ Skipping upload: {e}")
+                    continue
                 except Exception as e:
                     print(f"❌ Error processing {uploaded_file.name}: {e}")
                     continue
+                finally:
+                    if job:
+                        job.finish_file()
             
             if not documents:
                 print("❌ No documents could be processed")
                 return False
             
             # Create vector store
-            return self.create_vectorstore(documents) 
+            return self.create_vectorstore(documents, job=job) 
             
+        except IngestionCancelled:
+            raise
         except Exception as e:
             print(f"❌ Document setup failed: {e}")
             return False
 
-    def create_vectorstore(self, documents: List[Document]) -> bool:
-        """Create vector store from documents"""
+    def _extract_sections(self, buffer, file_extension: str, file_name: str) -> List[Tuple[str, dict]]:
+        """Extract (text, metadata) sections from a seekable file buffer - one per PDF page or DOCX heading"""
+        # handling text files
+        if file_extension == '.txt':
+            if isinstance(buffer, MappedFile):
+                # decode straight from the mapped pages, no intermediate bytes copy
+                with memoryview(buffer.mapping) as view:
+                    return [(str(view, 'utf-8'), {})]
+            # in-memory spools are bounded by spool_max_memory
+            return [(buffer.read().decode('utf-8'), {})]
+
+        # handling pdf files
+        if file_extension == '.pdf':
+            try:
+                import PyPDF2
+
+                pdf_reader = PyPDF2.PdfReader(buffer)
+                sections = []
+
+                for page_number, page in enumerate(pdf_reader.pages, start=1):
+                    page_text = page.extract_text()
+                    if page_text and page_text.strip():
+                        sections.append((page_text.strip(), {"page": page_number}))
+
+                return sections
+
+            except Exception as pdf_error:
+                # no sections, so the file is skipped instead of indexing the error
+                print(f"❌ PDF extraction failed for {file_name}: {pdf_error}")
+                return []
+
+        # handling docx file
+        if file_extension == '.docx':
+            try:
+                import docx
+
+                doc = docx.Document(buffer)
+                sections = []
+                section_title = None
+                text_parts = []
+
+                for paragraph in doc.paragraphs:
+                    if not (paragraph.text and paragraph.text.strip()):
+                        continue
+                    style_name = paragraph.style.name if paragraph.style is not None else ""
+                    if style_name.startswith("Heading") or style_name == "Title":
+                        # a heading starts a new section
+                        if text_parts:
+                            sections.append(("\n\n".join(text_parts), {"section": section_title} if section_title else {}))
+                        section_title = paragraph.text.strip()
+                        text_parts = []
+                    text_parts.append(paragraph.text.strip())
+
+                if text_parts:
+                    sections.append(("\n\n".join(text_parts), {"section": section_title} if section_title else {}))
+
+                return sections
+
+            except Exception as docx_error:
+                print(f"❌ DOCX extraction failed for {file_name}: {docx_error}")
+                return []
+
+        return []
+
+    def create_vectorstore(self, documents: List[Document], job=None) -> bool:
+        """Build a new vector store from documents and swap it in atomically"""
+        new_vectorstore = None
         try:
             print(f"📚 Creating vector store from {len(documents)} documents...")
             
             # Split documents into chunks
-            texts = self.text_splitter.split_documents(documents)
+            with metrics.timer("splitting"):
+                texts = self.text_splitter.split_documents(documents)
             print(f"Split into {len(texts)} chunks")
             
             if not texts:
                 print("❌ No text chunks created")
                 return False
             
-            # Create vectorstore
-            self.vectorstore = Chroma.from_documents(
-                documents=texts,
-                embedding=self.embeddings,
-                persist_directory="./chroma_db"
-            )
+            # Reclaim collections a previous run of the app left behind
+            _sweep_once(self.persist_directory)
+
+            # Build into fresh collection(s) so the current index keeps serving
+            if self.num_shards > 1:
+                new_vectorstore = ShardedVectorStore(
+                    self.embeddings,
+                    self.persist_directory,
+                    num_shards=self.num_shards,
+                    shard_by=self.shard_by
+                )
+            else:
+                new_vectorstore = Chroma(
+                    collection_name=f"documents_{uuid.uuid4().hex[:12]}",
+                    embedding_function=self.embeddings,
+                    persist_directory=self.persist_directory,
+                    collection_metadata={"created_at": time.time()}
+                )
+            self._owned_vectorstores.append(new_vectorstore)
+            if job:
+                job.set_chunks_total(len(texts))
+
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                if job:
+                    job.raise_if_cancelled()
+                batch = texts[start:start + EMBED_BATCH_SIZE]
+                with metrics.timer("embedding"):
+                    new_vectorstore.add_documents(batch)
+                if job:
+                    job.add_chunks(len(batch))
+
+            index_stats = {
+                "chunk_count": len(texts),
+                "bytes": sum(len(t.page_content.encode("utf-8")) for t in texts),
+                "sources": sorted({t.metadata.get("source", "") for t in texts}),
+            }
+            metadata_index = self._build_metadata_index(texts)
+
+            # Swap, then drop the previous collection
+            with self._swap_lock:
+                if job:
+                    job.raise_if_cancelled()
+                old_vectorstore = self.vectorstore
+                self.metadata_index = metadata_index
+                self.vectorstore = new_vectorstore
+                self.index_stats = index_stats
+                new_vectorstore = None
+            metrics.increment("chunks_indexed", len(texts))
+            metrics.increment("bytes_indexed", index_stats["bytes"])
+            if old_vectorstore is not None:
+                self._drop_vectorstore(old_vectorstore)
             
             print(f"✅ Vector store created with {len(texts)} chunks")
             return True
             
+        except IngestionCancelled:
+            raise
         except Exception as e:
             print(f"❌ Vector store creation failed: {e}")
             return False
+        finally:
+            # Discard a partially built collection
+            if new_vectorstore is not None:
+                self._drop_vectorstore(new_vectorstore)
+
+    def _build_metadata_index(self, texts: List[Document]) -> Dict[str, dict]:
+        """Summarise chunk metadata per source for filter validation and source lookup"""
+        metadata_index = {}
+        for text in texts:
+            metadata = text.metadata
+            entry = metadata_index.setdefault(metadata.get("source", ""), {
+                "pages": set(),
+                "sections": [],
+                "upload_time": metadata.get("upload_time"),
+                "chunk_count": 0,
+            })
+            entry["chunk_count"] += 1
+            if "page" in metadata:
+                entry["pages"].add(metadata["page"])
+            if metadata.get("section") and metadata["section"] not in entry["sections"]:
+                entry["sections"].append(metadata["section"])
+
+        for entry in metadata_index.values():
+            entry["pages"] = sorted(entry["pages"])
+        return metadata_index
+
+    def _drop_vectorstore(self, vectorstore):
+        """Drop one of this processor's collections"""
+        try:
+            vectorstore.delete_collection()
+        except Exception as e:
+            print(f"Could not drop collection: {e}")
+        try:
+            _remove_unreferenced_segments(self.persist_directory)
+        except Exception as e:
+            print(f"Could not remove dropped segments: {e}")
+        if vectorstore in self._owned_vectorstores:
+            self._owned_vectorstores.remove(vectorstore)
 
     def clear_vectorstore(self):
-        """Clear all documents from vector store"""
+        """Clear this processor's documents; other sessions' collections are left alone"""
         try:
-            # Clear vectorstore object
-            if hasattr(self, 'vectorstore') and self.vectorstore:
-                try:
-                    del self.vectorstore
-                except:
-                    pass
+            with self._swap_lock:
+                vectorstore = self.vectorstore
+                self.vectorstore = None
+                self.index_stats = {"chunk_count": 0, "bytes": 0, "sources": []}
+                self.metadata_index = {}
             
-            self.vectorstore = None
-            
-            # Remove database directory
-            if os.path.exists("./chroma_db"):
-                try:
-                    shutil.rmtree("./chroma_db")
-                    print("🗑️ Removed old vectorstore")
-                except:
-                    pass
+            if vectorstore is not None:
+                self._drop_vectorstore(vectorstore)
+                print("🗑️ Removed old vectorstore")
             
             print("✅ Documents cleared")
         except Exception as e:
             print(f"Error clearing documents: {e}")
 
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Search for similar documents"""
-        if self.vectorstore is None:
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query"""
+        with metrics.timer("query_embedding"):
+            return self.embeddings.embed_query(query)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          sources: Optional[List[str]] = None) -> List[Document]:
+        """Search for similar documents, optionally restricted by a Chroma metadata filter"""
+        vectorstore = self.vectorstore
+        if vectorstore is None:
             return []
         
         try:
-            results = self.vectorstore.similarity_search(query, k=k)
+            embedding = self.embed_query(query)
+            with metrics.timer("vector_search", filtered=filter is not None):
+                if isinstance(vectorstore, ShardedVectorStore):
+                    results = vectorstore.similarity_search_by_vector(embedding, k=k, filter=filter, sources=sources)
+                else:
+                    results = vectorstore.similarity_search_by_vector(embedding, k=k, filter=filter)
             return results
+        except ShardSearchError:
+            # the whole index is unreachable - don't let callers mistake it for "no matches"
+            metrics.increment("search_errors")
+            raise
         except Exception as e:
+            metrics.increment("search_errors")
             print(f"Error in similarity search: {e}")
             return []
 
+    def filtered_search(self, query: str, k: int = 4, sources: Optional[List[str]] = None,
+                        pages: Optional[List[int]] = None, section: Optional[str] = None) -> List[Document]:
+        """
+        Search only chunks from the given sources / pages / section.
+        The metadata filter is applied by Chroma before the vector scan.
+        """
+        conditions = []
+        if sources:
+            sources = [s for s in sources if s in self.metadata_index]
+            if not sources:
+                # Nothing indexed matches - skip the embedding call entirely
+                return []
+            conditions.append({"source": {"$in": sources}})
+        if pages:
+            conditions.append({"page": {"$in": [int(p) for p in pages]}})
+        if section:
+            conditions.append({"section": section})
+
+        if not conditions:
+            return self.similarity_search(query, k=k)
+
+        metrics.increment("filtered_searches")
+        where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+        return self.similarity_search(query, k=k, filter=where, sources=sources)
+
+    def resolve_sources(self, text: str) -> List[str]:
+        """
+        Find indexed sources a message explicitly refers to, e.g. "the pricing PDF" -> pricing_2024.pdf.
+        Matches the full file name, a multi-word file stem, or a file-name word followed by
+        a file noun ("pricing pdf", "handbook document"), always on word boundaries.
+        """
+        normalized = _normalize_words(text)
+        matches = []
+        for source in self.metadata_index:
+            # full file name, e.g. "pricing_2024.pdf"
+            if re.search(rf"(?<![\w.]){re.escape(source.lower())}(?![\w.])", text.lower()):
+                matches.append(source)
+                continue
+
+            stem_words = _normalize_words(os.path.splitext(source)[0]).split()
+            if not stem_words:
+                continue
+            # whole multi-word stem, e.g. "annual report 2024"
+            if len(stem_words) > 1 and re.search(rf"\b{re.escape(' '.join(stem_words))}\b", normalized):
+                matches.append(source)
+                continue
+            # a file-name word used as a file reference, e.g. "the pricing pdf"
+            if any(re.search(rf"\b{re.escape(word)}\s+{FILE_REFERENCE_WORDS}\b", normalized)
+                   for word in stem_words if not word.isdigit()):
+                matches.append(source)
+        return matches
+
+    def list_sources(self) -> Dict[str, dict]:
+        """Get per-source metadata of the live index"""
+        return {source: dict(entry) for source, entry in self.metadata_index.items()}
+
     def get_vectorstore_info(self) -> dict:
-        """Get information about the current vectorstore"""
-        info = {
+        """Get information about the current vectorstore from ingest-time metadata"""
+        stats = self.index_stats
+        return {
             "vectorstore_exists": self.vectorstore is not None,
-            "embeddings_model": "models/embedding-001",
+            "embeddings_model": EMBEDDINGS_MODEL,
             "chunk_size": self.text_splitter._chunk_size,
-            "chunk_overlap": self.text_splitter._chunk_overlap
+            "chunk_overlap": self.text_splitter._chunk_overlap,
+            "has_documents": stats["chunk_count"] > 0,
+            "chunk_count": stats["chunk_count"],
+            "bytes": stats["bytes"],
+            "sources": list(stats["sources"]),
         }
-        
-        if self.vectorstore:
-            try:                
-                test_search = self.vectorstore.similarity_search("", k=1)
-                info["has_documents"] = len(test_search) > 0
-                info["sample_content"] = test_search[0].page_content[:100] if test_search else "No content"
-            except Exception as e:
-                info["error"] = str(e)
-        
-        return info
@@ -0,0 +1,165 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+# Finished jobs stay pollable for this long before they are forgotten
+JOB_RETENTION_SECONDS = 3600
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class IngestionCancelled(Exception):
+    """Raised inside an ingestion run when its job has been cancelled"""
+
+
+#---- Ingestion job
+class IngestionJob:
+    def __init__(self, file_names):
+        self.id = uuid.uuid4().hex
+        self.file_names = list(file_names)
+        self.status = "queued"
+        self.files_total = len(self.file_names)
+        self.files_done = 0
+        self.current_file = None
+        self.chunks_total = 0
+        self.chunks_done = 0
+        self.error = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Mark the job running once its processor is free; a cancelled job never starts"""
+        with self._lock:
+            self.raise_if_cancelled()
+            self.status = "running"
+
+    def start_file(self, file_name: str):
+        self.raise_if_cancelled()
+        with self._lock:
+            self.current_file = file_name
+
+    def finish_file(self):
+        with self._lock:
+            self.files_done += 1
+            self.current_file = None
+
+    def set_chunks_total(self, total: int):
+        with self._lock:
+            self.chunks_total = total
+            self.chunks_done = 0
+
+    def add_chunks(self, count: int):
+        with self._lock:
+            self.chunks_done += count
+
+    def finish(self, status: str, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.monotonic()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._cancel_event.is_set():
+            raise IngestionCancelled(f"Ingestion job {self.id} was cancelled")
+
+    def snapshot(self) -> Dict:
+        """Get a consistent copy of the job's progress"""
+        with self._lock:
+            # Extraction counts for the first half of the bar, embedding for the second
+            file_progress = self.files_done / self.files_total if self.files_total else 1.0
+            chunk_progress = self.chunks_done / self.chunks_total if self.chunks_total else 0.0
+            if self.status == "completed":
+                progress = 1.0
+            else:
+                progress = 0.5 * file_progress + 0.5 * chunk_progress
+
+            return {
+                "id": self.id,
+                "status": self.status,
+                "file_names": list(self.file_names),
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "current_file": self.current_file,
+                "chunks_total": self.chunks_total,
+                "chunks_done": self.chunks_done,
+                "progress": progress,
+                "error": self.error,
+            }
+
+
+#---- Background ingestion queue
+class IngestionQueue:
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, document_processor, uploaded_files) -> str:
+        """Queue uploaded files for ingestion and return the job id"""
+        job = IngestionJob(f.name for f in uploaded_files)
+        with self._lock:
+            self._prune_finished()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, document_processor, list(uploaded_files))
+        return job.id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Get job progress, or None for an unknown job"""
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; the job stops at its next checkpoint"""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+        job.cancel()
+        return True
+
+    def _prune_finished(self):
+        """Forget jobs that finished more than JOB_RETENTION_SECONDS ago"""
+        cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values()
+                       if j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job: IngestionJob, document_processor, uploaded_files):
+        if job.is_cancelled():
+            job.finish("cancelled")
+            return
+
+        # setup_documents marks the job running once it holds the processor's ingest lock
+        try:
+            success = document_processor.setup_documents(uploaded_files, job=job)
+            if success:
+                job.finish("completed")
+            else:
+                job.finish("failed", "No documents could be processed")
+        except IngestionCancelled:
+            print(f"🛑 Ingestion job {job.id} cancelled")
+            job.finish("cancelled")
+        except Exception as e:
+            print(f"❌ Ingestion job {job.id} failed: {e}")
+            job.finish("failed", str(e))
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Get the process-wide ingestion queue shared by all sessions"""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = IngestionQueue()
+        return _default_queue
@@ -0,0 +1,169 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("conversational_chatbot")
+except ImportError:
+    _tracer = None
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "chatbot"
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key: Tuple, extra: Dict[str, str] = None) -> str:
+    pairs = list(label_key) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+#---- Metrics registry
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._timers: Dict[Tuple, Dict] = {}
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add value to a counter"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float, **labels):
+        """Record one stage duration"""
+        key = _label_key(dict(labels, stage=stage))
+        with self._lock:
+            timer = self._timers.get(key)
+            if timer is None:
+                timer = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(LATENCY_BUCKETS)}
+                self._timers[key] = timer
+            timer["count"] += 1
+            timer["sum"] += seconds
+            timer["max"] = max(timer["max"], seconds)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    timer["buckets"][i] += 1
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Time a block as a named stage, emitting an OpenTelemetry span when available"""
+        start = time.perf_counter()
+        if _tracer is not None:
+            with _tracer.start_as_current_span(f"{METRIC_PREFIX}.{stage}", attributes=labels):
+                try:
+                    yield
+                finally:
+                    self.observe(stage, time.perf_counter() - start, **labels)
+        else:
+            try:
+                yield
+            finally:
+                self.observe(stage, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict:
+        """Get a plain-dict copy of all counters and stage timings"""
+        with self._lock:
+            counters = {
+                name + _format_labels(labels): value
+                for (name, labels), value in self._counters.items()
+            }
+            stages = {
+                _format_labels(key): {
+                    "count": t["count"],
+                    "sum": t["sum"],
+                    "avg": t["sum"] / t["count"] if t["count"] else 0.0,
+                    "max": t["max"],
+                }
+                for key, t in self._timers.items()
+            }
+        return {"counters": counters, "stages": stages}
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self._counters})
+            for name in counter_names:
+                metric = f"{METRIC_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+            if self._timers:
+                metric = f"{METRIC_PREFIX}_stage_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, t in sorted(self._timers.items()):
+                    for bound, count in zip(LATENCY_BUCKETS, t["buckets"]):
+                        lines.append(f"{metric}_bucket{_format_labels(labels, {'le': bound})} {count}")
+                    lines.append(f"{metric}_bucket{_format_labels(labels, {'le': '+Inf'})} {t['count']}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {t['sum']}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {t['count']}")
+
+                metric = f"{METRIC_PREFIX}_stage_max_seconds"
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, t in sorted(self._timers.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {t['max']}")
+
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+
+# Process-wide registry shared by all sessions
+metrics = MetricsRegistry()
+
+
+#---- Prometheus scrape endpoint
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> bool:
+    """Serve /metrics on a background thread; safe to call more than once"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            print(f"❌ Could not start metrics server on port {port}: {e}")
+            return False
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📊 Metrics available at http://{host}:{port}/metrics")
+        return True
@@ -0,0 +1,165 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from utils.metrics import metrics
+
+# Fraction of calls to profile; 0 disables profiling entirely
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Comma-separated subset of: cprofile, tracemalloc
+PROFILE_MODES = os.getenv("PROFILE_MODES", "cprofile,tracemalloc")
+
+PROFILE_TOP_FUNCTIONS = 50
+PROFILE_TOP_ALLOCATIONS = 25
+
+
+#---- Request profiler
+class RequestProfiler:
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, output_dir: str = PROFILE_DIR,
+                 modes: str = PROFILE_MODES):
+        self.configure(sample_rate, output_dir, modes)
+        # cProfile and tracemalloc are process-wide, so only one call is profiled at a time
+        self._lock = threading.Lock()
+
+    def configure(self, sample_rate: float = None, output_dir: str = None, modes: str = None):
+        """Change profiling settings at runtime"""
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if modes is not None:
+            self.modes = {m.strip().lower() for m in modes.split(",") if m.strip()}
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, name: str, func: Callable, args: tuple, kwargs: dict,
+            metadata: Optional[Dict] = None):
+        """Call func under cProfile / tracemalloc and write reports to output_dir"""
+        if not self._lock.acquire(blocking=False):
+            # Another call is already being profiled - run this one unprofiled
+            metrics.increment("profile_skipped", call=name)
+            return func(*args, **kwargs)
+
+        profile = None
+        started_tracemalloc = False
+        error = None
+        start_time = datetime.now()
+        start = time.perf_counter()
+        try:
+            if "tracemalloc" in self.modes:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    started_tracemalloc = True
+                tracemalloc.reset_peak()
+            if "cprofile" in self.modes:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    # Another profiler (e.g. a debugger) owns the hook
+                    print(f"cProfile unavailable: {e}")
+                    profile = None
+
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                error = repr(e)
+                raise
+        finally:
+            duration = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            try:
+                self._write_reports(name, profile, start_time, duration, error, metadata or {})
+            except Exception as e:
+                print(f"❌ Writing profile for {name} failed: {e}")
+            finally:
+                if started_tracemalloc:
+                    tracemalloc.stop()
+                self._lock.release()
+
+    def _write_reports(self, name: str, profile, start_time: datetime, duration: float,
+                       error: Optional[str], metadata: Dict):
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(
+            self.output_dir,
+            f"{start_time.strftime('%Y%m%d-%H%M%S')}_{name}_{uuid.uuid4().hex[:8]}"
+        )
+        report = {
+            "name": name,
+            "started_at": start_time.isoformat(),
+            "duration_seconds": duration,
+            "error": error,
+            "modes": sorted(self.modes),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            "python": sys.version.split()[0],
+            "metadata": metadata,
+        }
+
+        if profile is not None:
+            profile.dump_stats(f"{prefix}.prof")
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            with open(f"{prefix}_cprofile.txt", "w", encoding="utf-8") as f:
+                f.write(stream.getvalue())
+
+        if tracemalloc.is_tracing() and "tracemalloc" in self.modes:
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced_memory_bytes"] = current
+            report["peak_traced_memory_bytes"] = peak
+            top_stats = tracemalloc.take_snapshot().statistics("lineno")
+            with open(f"{prefix}_allocations.txt", "w", encoding="utf-8") as f:
+                f.write(f"Peak traced memory: {peak} bytes (process-wide, all threads)\n\n")
+                for stat in top_stats[:PROFILE_TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+        print(f"🔬 Profiled {name} in {duration:.3f}s -> {prefix}.*")
+
+
+# Process-wide profiler shared by all sessions
+profiler = RequestProfiler()
+
+
+def profiled(name: str, metadata: Optional[Callable[..., Dict]] = None):
+    """
+    Decorator that profiles a sampled fraction of calls.
+
+    metadata is called with the wrapped call's arguments and returns a dict
+    stored alongside the reports. With a zero sample rate the wrapper only
+    does a single attribute check before calling through.
+
+    Only one call is profiled at a time and tracemalloc traces every thread, so
+    a sampled call that overlaps a profiled one runs unprofiled and is counted
+    in the profile_skipped metric.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if profiler.sample_rate <= 0 or not profiler.should_sample():
+                return func(*args, **kwargs)
+
+            try:
+                call_metadata = metadata(*args, **kwargs) if metadata else {}
+            except Exception as e:
+                call_metadata = {"metadata_error": repr(e)}
+            return profiler.run(name, func, args, kwargs, call_metadata)
+        return wrapper
+    return decorator
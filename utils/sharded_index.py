@@ -0,0 +1,245 @@
+import hashlib
+import heapq
+import multiprocessing
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_community.vectorstores import Chroma
+
+from utils.metrics import metrics
+
+# Number of index shards; 1 keeps a single Chroma collection
+INDEX_SHARDS = int(os.getenv("INDEX_SHARDS", 1))
+# How chunks are assigned to shards: "source" keeps a file together, "hash" spreads chunks evenly
+INDEX_SHARD_BY = os.getenv("INDEX_SHARD_BY", "source")
+# Where shard searches run: "thread" (Chroma's native query releases the GIL) or
+# "process" (one pinned worker process per shard index)
+INDEX_SHARD_WORKERS = os.getenv("INDEX_SHARD_WORKERS", "thread")
+
+class ShardSearchError(RuntimeError):
+    """Raised when every shard queried for a search failed"""
+
+
+# (distance, page_content, metadata) - lower distance is better
+ShardHit = Tuple[float, str, Dict]
+
+
+def shard_for(document: Document, num_shards: int, shard_by: str = INDEX_SHARD_BY) -> int:
+    """Pick a stable shard for a chunk"""
+    source = str(document.metadata.get("source", ""))
+    if shard_by == "hash":
+        key = f"{source}\0{document.page_content}"
+    else:
+        key = source
+    digest = hashlib.md5(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+#---- Worker process side
+# persist directory -> client; every shard has its own directory
+_worker_clients = {}
+
+
+def _reset_worker():
+    """Drop every cached client in this worker so dropped shards release their segments"""
+    from chromadb.api.client import SharedSystemClient
+
+    _worker_clients.clear()
+    SharedSystemClient.clear_system_cache()
+
+
+def _search_shard_in_worker(persist_directory: str, collection_name: str, embedding: List[float],
+                            k: int, where: Optional[Dict] = None) -> List[ShardHit]:
+    """Query one shard from its pinned worker process, reusing a client per shard directory"""
+    import chromadb
+
+    client = _worker_clients.get(persist_directory)
+    if client is None:
+        client = chromadb.PersistentClient(path=persist_directory)
+        _worker_clients[persist_directory] = client
+
+    try:
+        collection = client.get_collection(collection_name)
+    except Exception:
+        # cached client is stale - reopen the directory once
+        _reset_worker()
+        client = chromadb.PersistentClient(path=persist_directory)
+        _worker_clients[persist_directory] = client
+        collection = client.get_collection(collection_name)
+
+    result = collection.query(
+        query_embeddings=[embedding],
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"],
+    )
+    return list(zip(result["distances"][0], result["documents"][0], result["metadatas"][0]))
+
+
+#---- Shards
+class LocalShard:
+    """
+    One shard backed by a Chroma collection in its own directory. A shard on
+    another node only needs the same add_documents / search / delete methods.
+    """
+
+    def __init__(self, index: int, persist_directory: str, collection_name: str, embeddings):
+        self.index = index
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.vectorstore = Chroma(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=persist_directory
+        )
+
+    def add_documents(self, documents: List[Document]):
+        self.vectorstore.add_documents(documents)
+
+    def search(self, embedding: List[float], k: int, where: Optional[Dict] = None) -> List[ShardHit]:
+        results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=where
+        )
+        return [(distance, doc.page_content, doc.metadata) for doc, distance in results]
+
+    def submit_search(self, kind: str, embedding: List[float], k: int, where: Optional[Dict] = None):
+        if kind == "process":
+            return _submit_to_shard_worker(
+                self.index, _search_shard_in_worker,
+                self.persist_directory, self.collection_name, embedding, k, where
+            )
+        return get_search_executor(kind).submit(self.search, embedding, k, where)
+
+    def delete(self, kind: str):
+        try:
+            self.vectorstore.delete_collection()
+            if kind == "process":
+                # the pinned worker still holds this shard's segments
+                _reset_shard_worker(self.index)
+        finally:
+            shutil.rmtree(self.persist_directory, ignore_errors=True)
+
+
+_thread_executor = None
+# shard index -> single-process pool, so each shard is only ever loaded by one worker
+_process_executors: Dict[int, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_search_executor(kind: str, shard_index: int = 0):
+    """Get the process-wide pool that runs searches for a shard"""
+    global _thread_executor
+    with _executors_lock:
+        if kind == "process":
+            executor = _process_executors.get(shard_index)
+            if executor is None:
+                # spawn: forking a threaded Streamlit server is unsafe
+                executor = ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                )
+                _process_executors[shard_index] = executor
+            return executor
+
+        if _thread_executor is None:
+            _thread_executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 2, thread_name_prefix="shard-search"
+            )
+        return _thread_executor
+
+
+def _submit_to_shard_worker(shard_index: int, fn, *args):
+    """Submit to a shard's pinned worker, replacing the pool once if its process died"""
+    try:
+        return get_search_executor("process", shard_index).submit(fn, *args)
+    except BrokenProcessPool:
+        with _executors_lock:
+            _process_executors.pop(shard_index, None)
+        return get_search_executor("process", shard_index).submit(fn, *args)
+
+
+def _reset_shard_worker(shard_index: int):
+    """Make a shard's pinned worker drop its clients; skipped when there is no live worker"""
+    with _executors_lock:
+        executor = _process_executors.get(shard_index)
+    if executor is None:
+        # no worker has opened this shard
+        return None
+    try:
+        return executor.submit(_reset_worker)
+    except RuntimeError:
+        # shut down (interpreter exit) or broken - the worker and its clients are gone
+        return None
+
+
+#---- Sharded vector store
+class ShardedVectorStore:
+    """Vector store split across shards, searched scatter-gather with a global top-k merge"""
+
+    def __init__(self, embeddings, persist_directory: str, num_shards: int = INDEX_SHARDS,
+                 shard_by: str = INDEX_SHARD_BY, workers: str = INDEX_SHARD_WORKERS):
+        self.shard_by = shard_by
+        self.workers = workers
+        prefix = f"documents_{uuid.uuid4().hex[:12]}"
+        self.shards = [
+            LocalShard(
+                i,
+                os.path.join(persist_directory, "shards", f"{prefix}_shard{i}"),
+                f"{prefix}_shard{i}",
+                embeddings
+            )
+            for i in range(num_shards)
+        ]
+
+    def add_documents(self, documents: List[Document]):
+        """Route each chunk to its shard"""
+        by_shard: Dict[int, List[Document]] = {}
+        for doc in documents:
+            by_shard.setdefault(shard_for(doc, len(self.shards), self.shard_by), []).append(doc)
+        for index, shard_docs in by_shard.items():
+            self.shards[index].add_documents(shard_docs)
+
+    def shards_for_sources(self, sources: List[str]) -> List[LocalShard]:
+        """Shards that can hold chunks of the given sources"""
+        if self.shard_by != "source":
+            return self.shards
+        indexes = {shard_for(Document(page_content="", metadata={"source": s}), len(self.shards), "source")
+                   for s in sources}
+        return [self.shards[i] for i in sorted(indexes)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    filter: Optional[Dict] = None,
+                                    sources: Optional[List[str]] = None) -> List[Document]:
+        """Search shards in parallel and merge the per-shard top-k; sources prunes shards when sharding by source"""
+        shards = self.shards_for_sources(sources) if sources else self.shards
+        futures = [shard.submit_search(self.workers, embedding, k, filter) for shard in shards]
+
+        hits: List[ShardHit] = []
+        errors = []
+        for future in futures:
+            try:
+                hits.extend(future.result())
+            except Exception as e:
+                # Partial failure degrades results; it doesn't fail the query
+                metrics.increment("shard_search_errors")
+                print(f"Shard search failed: {e}")
+                errors.append(e)
+
+        metrics.increment("shard_searches", len(futures))
+        if futures and len(errors) == len(futures):
+            raise ShardSearchError(f"All {len(futures)} shard searches failed: {errors[0]}") from errors[0]
+
+        best = heapq.nsmallest(k, hits, key=lambda hit: hit[0])
+        return [Document(page_content=text, metadata=metadata or {}) for _, text, metadata in best]
+
+    def delete_collection(self):
+        for shard in self.shards:
+            try:
+                shard.delete(self.workers)
+            except Exception as e:
+                print(f"Could not drop shard {shard.collection_name}: {e}")
@@ -0,0 +1,113 @@
+import io
+import mmap
+import tempfile
+from contextlib import contextmanager
+
+# Size of each block copied from the upload into the spool
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an uploaded file exceeds the configured size limit"""
+
+
+#---- Upload buffering
+class MappedFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memory-mapped spool. Parsers such as
+    zipfile need seekable(), which mmap itself only gained in Python 3.13.
+    """
+
+    def __init__(self, mapping: mmap.mmap):
+        self.mapping = mapping
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self.mapping) + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self._position = position
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self.mapping) if size is None or size < 0 else self._position + size
+        data = self.mapping[self._position:end]
+        self._position += len(data)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+@contextmanager
+def spooled_upload(uploaded_file, max_memory_size: int, max_upload_size: int):
+    """
+    Yield a seekable, read-only buffer over an uploaded file's bytes.
+
+    Uploads up to max_memory_size bytes stay in an in-memory spool. Larger
+    uploads - or every upload when max_memory_size <= 0 - are written to a
+    temporary file on disk and memory-mapped, and are yielded as a MappedFile
+    so parsers page data in from disk. The upload is copied in fixed-size
+    blocks rather than via getvalue().
+    """
+    size = getattr(uploaded_file, "size", None)
+    if max_upload_size and size is not None and size > max_upload_size:
+        raise UploadTooLargeError(
+            f"{uploaded_file.name} is {size} bytes (limit {max_upload_size} bytes)"
+        )
+
+    if max_memory_size <= 0:
+        # SpooledTemporaryFile(max_size=0) never rolls over - go straight to disk
+        spool = tempfile.TemporaryFile()
+    else:
+        spool = tempfile.SpooledTemporaryFile(max_size=max_memory_size)
+    mapped = None
+    try:
+        uploaded_file.seek(0)
+        copied = 0
+        while True:
+            block = uploaded_file.read(COPY_CHUNK_SIZE)
+            if not block:
+                break
+            copied += len(block)
+            if max_upload_size and copied > max_upload_size:
+                raise UploadTooLargeError(
+                    f"{uploaded_file.name} exceeds the {max_upload_size} byte upload limit"
+                )
+            spool.write(block)
+        spool.flush()
+        uploaded_file.seek(0)
+
+        if copied > 0 and (max_memory_size <= 0 or copied > max_memory_size):
+            # Spool is on disk - map it instead of reading it back
+            mapped = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+            with MappedFile(mapped) as mapped_file:
+                yield mapped_file
+        else:
+            spool.seek(0)
+            yield spool
+    finally:
+        if mapped is not None:
+            mapped.close()
+        spool.close()